@@ -1,12 +1,18 @@
 import streamlit as st
 from datetime import datetime, date, timedelta
 import json
+import logging
 import os
 import hashlib
+import hmac
 import csv
 from io import StringIO
 import pytz
 import urllib.parse
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
 
 # Configuração da página
 st.set_page_config(
@@ -18,10 +24,10 @@ st.set_page_config(
 
 # Tente importar SQLAlchemy com fallback
 try:
-    from sqlalchemy import create_engine, Column, String, Integer, Float, DateTime, Text, ForeignKey, UniqueConstraint
+    from sqlalchemy import create_engine, Column, String, Integer, Float, DateTime, Text, ForeignKey, UniqueConstraint, Index, func, insert, case, event
     from sqlalchemy.ext.declarative import declarative_base
     from sqlalchemy.orm import sessionmaker
-    from sqlalchemy.exc import IntegrityError
+    from sqlalchemy.exc import IntegrityError, SQLAlchemyError
     SQLALCHEMY_AVAILABLE = True
 except ImportError as e:
     st.error(f"Erro ao importar SQLAlchemy: {e}")
@@ -37,10 +43,39 @@ def get_database_url():
     else:
         return 'sqlite:///gestao.db'
 
+# Engine compartilhado entre sessões e reruns
+@st.cache_resource
+def get_engine():
+    database_url = get_database_url()
+    if not database_url.startswith('sqlite'):
+        # Pool de conexões do PostgreSQL
+        return create_engine(
+            database_url,
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            pool_pre_ping=True
+        )
+    
+    # Espera até 30s pelo lock de escrita
+    engine = create_engine(database_url, connect_args={'timeout': 30})
+    
+    # Configuração de cada conexão SQLite
+    @event.listens_for(engine, 'connect')
+    def configurar_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA cache_size=-16000')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute('PRAGMA mmap_size=268435456')
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+    return engine
+
 # Inicialização do banco apenas se SQLAlchemy estiver disponível
 if SQLALCHEMY_AVAILABLE:
     try:
-        engine = create_engine(get_database_url())
+        engine = get_engine()
         Base = declarative_base()
 
         # Definir modelos
@@ -88,78 +123,117 @@ if SQLALCHEMY_AVAILABLE:
             __tablename__ = 'estoque_escolas'
             id = Column(Integer, primary_key=True)
             escola_id = Column(Integer, ForeignKey('escolas.id'))
-            produto_id = Column(Integer, ForeignKey('produtos.id'))
+            produto_id = Column(Integer, ForeignKey('produtos.id'), index=True)
             quantidade = Column(Integer, default=0)
             __table_args__ = (UniqueConstraint('escola_id', 'produto_id', name='_escola_produto_uc'),)
 
         class Pedido(Base):
             __tablename__ = 'pedidos'
             id = Column(Integer, primary_key=True)
-            cliente_id = Column(Integer, ForeignKey('clientes.id'))
-            escola_id = Column(Integer, ForeignKey('escolas.id'))
+            cliente_id = Column(Integer, ForeignKey('clientes.id'), index=True)
+            escola_id = Column(Integer, ForeignKey('escolas.id'), index=True)
             status = Column(String(20), default='Pendente')
             total = Column(Float)
             desconto = Column(Float, default=0)
             custo_total = Column(Float)
             lucro_total = Column(Float)
             margem_lucro = Column(Float)
-            criado_em = Column(DateTime, default=datetime.now)
+            criado_em = Column(DateTime, default=datetime.now, index=True)
+            __table_args__ = (Index('ix_pedidos_status_criado_em', 'status', 'criado_em'),)
 
         class ItemPedido(Base):
             __tablename__ = 'itens_pedido'
             id = Column(Integer, primary_key=True)
-            pedido_id = Column(Integer, ForeignKey('pedidos.id'))
-            produto_id = Column(Integer, ForeignKey('produtos.id'))
+            pedido_id = Column(Integer, ForeignKey('pedidos.id'), index=True)
+            produto_id = Column(Integer, ForeignKey('produtos.id'), index=True)
             quantidade = Column(Integer)
             preco_unitario = Column(Float)
             custo_unitario = Column(Float)
             lucro_unitario = Column(Float)
             margem_lucro = Column(Float)
 
-        # Criar tabelas
-        Base.metadata.create_all(engine)
         Session = sessionmaker(bind=engine)
         
     except Exception as e:
         st.error(f"Erro ao inicializar SQLAlchemy: {e}")
         SQLALCHEMY_AVAILABLE = False
 
+# Opções fixas dos formulários
+TAMANHOS = ("", "PP", "P", "M", "G", "GG", "EXG", "2", "4", "6", "8", "10", "12", "Único")
+NIVEIS_USUARIO = ("admin", "gestor", "vendedor")
+PEDIDOS_POR_PAGINA = 50
+
+FORMATO_DATA_BR = "%d/%m/%Y %H:%M"
+
 # Função para obter data/hora do Brasil
+TZ_BRASIL = pytz.timezone('America/Sao_Paulo')
+
 def get_brasil_datetime():
-    tz_brasil = pytz.timezone('America/Sao_Paulo')
-    return datetime.now(tz_brasil)
+    return datetime.now(TZ_BRASIL)
 
 def format_date_br(dt):
-    if isinstance(dt, str):
-        try:
-            dt = datetime.strptime(dt, '%Y-%m-%d %H:%M:%S')
-        except:
-            return dt
-    return dt.strftime("%d/%m/%Y %H:%M")
+    if isinstance(dt, (datetime, date)):
+        return dt.strftime(FORMATO_DATA_BR)
+    if not dt:
+        return "N/A"
+    # Texto no formato 'AAAA-MM-DD HH:MM:SS'
+    texto = str(dt)
+    if len(texto) >= 16 and texto[4] == '-' and texto[7] == '-' and texto[13] == ':':
+        return f"{texto[8:10]}/{texto[5:7]}/{texto[:4]} {texto[11:16]}"
+    return texto
 
 # Sistema de Autenticação
+@st.cache_resource
 def init_db():
     if not SQLALCHEMY_AVAILABLE:
         st.error("SQLAlchemy não está disponível. Verifique as dependências.")
-        return
+        return False
         
     session = Session()
     try:
+        # Criar tabelas
+        Base.metadata.create_all(engine)
+        # Criar índices novos em tabelas existentes
+        for tabela in Base.metadata.sorted_tables:
+            for indice in tabela.indexes:
+                indice.create(engine, checkfirst=True)
+        
         # Verificar se usuário admin existe
         admin = session.query(Usuario).filter_by(username='admin').first()
         if not admin:
-            senha_hash = hashlib.sha256("admin123".encode()).hexdigest()
+            senha_hash = hash_password("admin123")
             admin = Usuario(username='admin', password=senha_hash, nivel='admin')
             session.add(admin)
             session.commit()
+        return True
     except Exception as e:
         st.error(f"Erro ao inicializar banco: {e}")
         session.rollback()
+        return False
     finally:
         session.close()
 
+# Hash de senhas com PBKDF2
+PBKDF2_ITERACOES = 260000
+
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    salt = os.urandom(16)
+    derivada = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, PBKDF2_ITERACOES)
+    return f"pbkdf2_sha256${PBKDF2_ITERACOES}${salt.hex()}${derivada.hex()}"
+
+def check_password(password, senha_hash):
+    senha_bytes = password.encode('utf-8')
+    if senha_hash.startswith('pbkdf2_sha256$'):
+        _, iteracoes, salt, derivada = senha_hash.split('$')
+        calculada = hashlib.pbkdf2_hmac('sha256', senha_bytes, bytes.fromhex(salt), int(iteracoes))
+        return hmac.compare_digest(calculada.hex(), derivada)
+    # Senhas antigas, gravadas como SHA-256 simples
+    return hmac.compare_digest(hashlib.sha256(senha_bytes).hexdigest(), senha_hash)
+
+def precisa_rehash(senha_hash):
+    if not senha_hash.startswith('pbkdf2_sha256$'):
+        return True
+    return int(senha_hash.split('$')[1]) != PBKDF2_ITERACOES
 
 def verify_login(username, password):
     if not SQLALCHEMY_AVAILABLE:
@@ -169,10 +243,24 @@ def verify_login(username, password):
     session = Session()
     try:
         user = session.query(Usuario).filter_by(username=username).first()
-        if user and user.password == hash_password(password):
+        if user and check_password(password, user.password):
+            # Regravar hash antigo no formato atual
+            if precisa_rehash(user.password):
+                session.expunge(user)
+                try:
+                    novo_hash = hash_password(password)
+                    session.query(Usuario).filter_by(id=user.id).update(
+                        {Usuario.password: novo_hash}, synchronize_session=False
+                    )
+                    session.commit()
+                    user.password = novo_hash
+                except Exception:
+                    session.rollback()
+                    logger.exception("Erro ao atualizar o hash da senha")
             return user
         return None
     except Exception as e:
+        session.rollback()
         st.error(f"Erro ao verificar login: {e}")
         return None
     finally:
@@ -195,6 +283,8 @@ def add_cliente(nome, telefone, email, cpf, endereco):
         )
         session.add(cliente)
         session.commit()
+        get_clientes.clear()
+        get_contagens.clear()
         return True
     except Exception as e:
         session.rollback()
@@ -203,17 +293,21 @@ def add_cliente(nome, telefone, email, cpf, endereco):
     finally:
         session.close()
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_clientes():
     if not SQLALCHEMY_AVAILABLE:
         return []
         
     session = Session()
     try:
-        clientes = session.query(Cliente).order_by(Cliente.nome).all()
-        return [(c.id, c.nome, c.telefone, c.email, c.cpf, c.endereco, c.criado_em) for c in clientes]
-    except Exception as e:
-        st.error(f"Erro ao buscar clientes: {e}")
-        return []
+        clientes = session.query(
+            Cliente.id, Cliente.nome, Cliente.telefone, Cliente.email,
+            Cliente.cpf, Cliente.endereco, Cliente.criado_em
+        ).order_by(Cliente.nome).all()
+        return [tuple(c) for c in clientes]
+    except Exception:
+        logger.exception("Erro ao buscar clientes")
+        raise
     finally:
         session.close()
 
@@ -234,6 +328,8 @@ def add_escola(nome, telefone, email, endereco, responsavel):
         )
         session.add(escola)
         session.commit()
+        get_escolas.clear()
+        get_contagens.clear()
         return True
     except Exception as e:
         session.rollback()
@@ -242,17 +338,21 @@ def add_escola(nome, telefone, email, endereco, responsavel):
     finally:
         session.close()
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_escolas():
     if not SQLALCHEMY_AVAILABLE:
         return []
         
     session = Session()
     try:
-        escolas = session.query(Escola).order_by(Escola.nome).all()
-        return [(e.id, e.nome, e.telefone, e.email, e.endereco, e.responsavel, e.criado_em) for e in escolas]
-    except Exception as e:
-        st.error(f"Erro ao buscar escolas: {e}")
-        return []
+        escolas = session.query(
+            Escola.id, Escola.nome, Escola.telefone, Escola.email,
+            Escola.endereco, Escola.responsavel, Escola.criado_em
+        ).order_by(Escola.nome).all()
+        return [tuple(e) for e in escolas]
+    except Exception:
+        logger.exception("Erro ao buscar escolas")
+        raise
     finally:
         session.close()
 
@@ -264,11 +364,7 @@ def add_produto(nome, descricao, preco, custo, estoque_minimo, tamanho):
         
     session = Session()
     try:
-        # Verificar se produto já existe
-        existente = session.query(Produto).filter_by(nome=nome, tamanho=tamanho).first()
-        if existente:
-            return False, "Já existe um produto com este nome e tamanho"
-        
+        # Duplicidade barrada pela restrição única (nome, tamanho)
         produto = Produto(
             nome=nome,
             descricao=descricao,
@@ -278,8 +374,11 @@ def add_produto(nome, descricao, preco, custo, estoque_minimo, tamanho):
             tamanho=tamanho
         )
         session.add(produto)
+        session.flush()
+        produto_id = produto.id
         session.commit()
-        return True, produto.id
+        get_produtos.clear()
+        return True, produto_id
     except IntegrityError:
         session.rollback()
         return False, "Já existe um produto com este nome e tamanho"
@@ -290,17 +389,21 @@ def add_produto(nome, descricao, preco, custo, estoque_minimo, tamanho):
     finally:
         session.close()
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_produtos():
     if not SQLALCHEMY_AVAILABLE:
         return []
         
     session = Session()
     try:
-        produtos = session.query(Produto).order_by(Produto.nome, Produto.tamanho).all()
-        return [(p.id, p.nome, p.descricao, p.preco, p.custo, p.estoque_minimo, p.tamanho, p.criado_em) for p in produtos]
-    except Exception as e:
-        st.error(f"Erro ao buscar produtos: {e}")
-        return []
+        produtos = session.query(
+            Produto.id, Produto.nome, Produto.descricao, Produto.preco,
+            Produto.custo, Produto.estoque_minimo, Produto.tamanho, Produto.criado_em
+        ).order_by(Produto.nome, Produto.tamanho).all()
+        return [tuple(p) for p in produtos]
+    except Exception:
+        logger.exception("Erro ao buscar produtos")
+        raise
     finally:
         session.close()
 
@@ -312,22 +415,21 @@ def vincular_produto_todas_escolas(produto_id, quantidade_inicial=0):
         
     session = Session()
     try:
-        escolas = get_escolas()
-        for escola in escolas:
-            # Verificar se já existe
-            estoque = session.query(EstoqueEscola).filter_by(
-                escola_id=escola[0], produto_id=produto_id
-            ).first()
-            
-            if not estoque:
-                novo_estoque = EstoqueEscola(
-                    escola_id=escola[0],
-                    produto_id=produto_id,
-                    quantidade=quantidade_inicial
-                )
-                session.add(novo_estoque)
-        
+        # Escolas que ainda não têm o produto
+        vinculadas = session.query(EstoqueEscola.escola_id).filter_by(produto_id=produto_id)
+        escolas_sem_produto = session.query(Escola.id).filter(~Escola.id.in_(vinculadas)).all()
+
+        session.add_all([
+            EstoqueEscola(
+                escola_id=escola_id,
+                produto_id=produto_id,
+                quantidade=quantidade_inicial
+            )
+            for (escola_id,) in escolas_sem_produto
+        ])
+
         session.commit()
+        get_estoque_escola.clear()
         return True
     except Exception as e:
         session.rollback()
@@ -336,32 +438,30 @@ def vincular_produto_todas_escolas(produto_id, quantidade_inicial=0):
     finally:
         session.close()
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_estoque_escola(escola_id):
     if not SQLALCHEMY_AVAILABLE:
         return []
         
     session = Session()
     try:
-        estoque_items = session.query(EstoqueEscola, Produto).join(
+        estoque_items = session.query(
+            EstoqueEscola.id,
+            Produto.nome,
+            Produto.tamanho,
+            EstoqueEscola.quantidade,
+            Produto.estoque_minimo,
+            Produto.preco,
+            Produto.custo,
+            Produto.id
+        ).join(
             Produto, EstoqueEscola.produto_id == Produto.id
         ).filter(EstoqueEscola.escola_id == escola_id).all()
         
-        resultado = []
-        for estoque_item in estoque_items:
-            resultado.append((
-                estoque_item.EstoqueEscola.id, 
-                estoque_item.Produto.nome, 
-                estoque_item.Produto.tamanho, 
-                estoque_item.EstoqueEscola.quantidade, 
-                estoque_item.Produto.estoque_minimo,
-                estoque_item.Produto.preco,
-                estoque_item.Produto.custo,
-                estoque_item.Produto.id
-            ))
-        return resultado
-    except Exception as e:
-        st.error(f"Erro ao buscar estoque: {e}")
-        return []
+        return [tuple(estoque_item) for estoque_item in estoque_items]
+    except Exception:
+        logger.exception("Erro ao buscar estoque")
+        raise
     finally:
         session.close()
 
@@ -387,6 +487,7 @@ def update_estoque_escola(escola_id, produto_id, quantidade):
             session.add(estoque)
         
         session.commit()
+        get_estoque_escola.clear()
         return True
     except Exception as e:
         session.rollback()
@@ -396,6 +497,18 @@ def update_estoque_escola(escola_id, produto_id, quantidade):
         session.close()
 
 # Funções de Gestão de Pedidos
+def calcular_totais(itens, desconto):
+    # Totais do pedido (resumo do formulário e gravação)
+    total_venda = 0
+    total_custo = 0
+    for item in itens:
+        total_venda += item['quantidade'] * item['preco']
+        total_custo += item['quantidade'] * item['custo']
+    total_com_desconto = total_venda - (total_venda * desconto / 100)
+    lucro_total = total_com_desconto - total_custo
+    margem_lucro = (lucro_total / total_com_desconto * 100) if total_com_desconto > 0 else 0
+    return total_venda, total_com_desconto, total_custo, lucro_total, margem_lucro
+
 def add_pedido(cliente_id, escola_id, itens, desconto=0):
     if not SQLALCHEMY_AVAILABLE:
         st.error("Sistema de banco de dados não disponível")
@@ -403,52 +516,55 @@ def add_pedido(cliente_id, escola_id, itens, desconto=0):
         
     session = Session()
     try:
-        # Calcular totais
-        total_venda = sum(item['quantidade'] * item['preco'] for item in itens)
-        total_custo = sum(item['quantidade'] * item['custo'] for item in itens)
-        total_com_desconto = total_venda - (total_venda * desconto / 100)
-        lucro_total = total_com_desconto - total_custo
-        margem_lucro = (lucro_total / total_com_desconto * 100) if total_com_desconto > 0 else 0
+        _, total_com_desconto, total_custo, lucro_total, margem_lucro = calcular_totais(itens, desconto)
         
         # Criar pedido
-        pedido = Pedido(
-            cliente_id=cliente_id,
-            escola_id=escola_id,
-            total=total_com_desconto,
-            desconto=desconto,
-            custo_total=total_custo,
-            lucro_total=lucro_total,
-            margem_lucro=margem_lucro
-        )
-        session.add(pedido)
-        session.flush()  # Para obter o ID do pedido
+        pedido_id = session.execute(
+            insert(Pedido).values(
+                cliente_id=cliente_id,
+                escola_id=escola_id,
+                total=total_com_desconto,
+                desconto=desconto,
+                custo_total=total_custo,
+                lucro_total=lucro_total,
+                margem_lucro=margem_lucro
+            ).returning(Pedido.id)
+        ).scalar_one()
         
-        # Adicionar itens e atualizar estoque
+        # Adicionar itens
+        itens_pedido = []
+        quantidades = {}
         for item in itens:
             lucro_unitario = item['preco'] - item['custo']
             margem_unitario = (lucro_unitario / item['preco'] * 100) if item['preco'] > 0 else 0
             
-            item_pedido = ItemPedido(
-                pedido_id=pedido.id,
-                produto_id=item['produto_id'],
-                quantidade=item['quantidade'],
-                preco_unitario=item['preco'],
-                custo_unitario=item['custo'],
-                lucro_unitario=lucro_unitario,
-                margem_lucro=margem_unitario
-            )
-            session.add(item_pedido)
-            
-            # Atualizar estoque
-            estoque = session.query(EstoqueEscola).filter_by(
-                escola_id=escola_id, produto_id=item['produto_id']
-            ).first()
-            
-            if estoque:
-                estoque.quantidade -= item['quantidade']
+            itens_pedido.append({
+                'pedido_id': pedido_id,
+                'produto_id': item['produto_id'],
+                'quantidade': item['quantidade'],
+                'preco_unitario': item['preco'],
+                'custo_unitario': item['custo'],
+                'lucro_unitario': lucro_unitario,
+                'margem_lucro': margem_unitario
+            })
+            quantidades[item['produto_id']] = quantidades.get(item['produto_id'], 0) + item['quantidade']
+        
+        session.execute(insert(ItemPedido), itens_pedido)
+        
+        # Atualizar estoque
+        session.query(EstoqueEscola).filter(
+            EstoqueEscola.escola_id == escola_id,
+            EstoqueEscola.produto_id.in_(quantidades)
+        ).update(
+            {EstoqueEscola.quantidade: EstoqueEscola.quantidade - case(quantidades, value=EstoqueEscola.produto_id, else_=0)},
+            synchronize_session=False
+        )
         
         session.commit()
-        return pedido.id
+        get_pedidos.clear()
+        get_resumo_pedidos.clear()
+        get_estoque_escola.clear()
+        return pedido_id
     except Exception as e:
         session.rollback()
         st.error(f"Erro ao criar pedido: {e}")
@@ -456,38 +572,79 @@ def add_pedido(cliente_id, escola_id, itens, desconto=0):
     finally:
         session.close()
 
-def get_pedidos():
+@st.cache_data(ttl=60, show_spinner=False)
+def get_pedidos(limite=None, offset=0, status=None):
     if not SQLALCHEMY_AVAILABLE:
         return []
         
     session = Session()
     try:
-        pedidos_data = session.query(Pedido, Cliente, Escola).join(
+        query = session.query(
+            Pedido.id,
+            Pedido.cliente_id,
+            Pedido.escola_id,
+            Pedido.status,
+            Pedido.total,
+            Pedido.desconto,
+            Pedido.custo_total,
+            Pedido.lucro_total,
+            Pedido.margem_lucro,
+            Pedido.criado_em,
+            Cliente.nome,
+            Escola.nome
+        ).join(
             Cliente, Pedido.cliente_id == Cliente.id
         ).join(
             Escola, Pedido.escola_id == Escola.id
-        ).order_by(Pedido.criado_em.desc()).all()
+        )
         
-        resultado = []
-        for pedido_item in pedidos_data:
-            resultado.append((
-                pedido_item.Pedido.id, 
-                pedido_item.Pedido.cliente_id, 
-                pedido_item.Pedido.escola_id, 
-                pedido_item.Pedido.status,
-                pedido_item.Pedido.total, 
-                pedido_item.Pedido.desconto, 
-                pedido_item.Pedido.custo_total, 
-                pedido_item.Pedido.lucro_total,
-                pedido_item.Pedido.margem_lucro, 
-                pedido_item.Pedido.criado_em, 
-                pedido_item.Cliente.nome, 
-                pedido_item.Escola.nome
-            ))
-        return resultado
-    except Exception as e:
-        st.error(f"Erro ao buscar pedidos: {e}")
+        if status:
+            query = query.filter(Pedido.status == status)
+        
+        query = query.order_by(Pedido.criado_em.desc(), Pedido.id.desc())
+        if limite:
+            query = query.limit(limite).offset(offset)
+        
+        return [tuple(pedido) for pedido in query.all()]
+    except Exception:
+        logger.exception("Erro ao buscar pedidos")
+        raise
+    finally:
+        session.close()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def get_resumo_pedidos():
+    if not SQLALCHEMY_AVAILABLE:
         return []
+        
+    session = Session()
+    try:
+        resumo = session.query(
+            Pedido.status, func.count(Pedido.id), func.coalesce(func.sum(Pedido.total), 0)
+        ).group_by(Pedido.status).all()
+        return [(status, quantidade, total) for status, quantidade, total in resumo]
+    except Exception:
+        logger.exception("Erro ao buscar resumo de pedidos")
+        raise
+    finally:
+        session.close()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def get_contagens():
+    if not SQLALCHEMY_AVAILABLE:
+        return 0, 0
+        
+    session = Session()
+    try:
+        # Contagens de clientes e escolas
+        total_clientes, total_escolas = session.query(
+            session.query(func.count(Cliente.id)).scalar_subquery(),
+            session.query(func.count(Escola.id)).scalar_subquery()
+        ).one()
+        return total_clientes, total_escolas
+    except Exception:
+        logger.exception("Erro ao buscar contagens")
+        raise
     finally:
         session.close()
 
@@ -498,10 +655,13 @@ def update_pedido_status(pedido_id, novo_status):
         
     session = Session()
     try:
-        pedido = session.query(Pedido).filter_by(id=pedido_id).first()
-        if pedido:
-            pedido.status = novo_status
-            session.commit()
+        atualizados = session.query(Pedido).filter_by(id=pedido_id).update(
+            {Pedido.status: novo_status}, synchronize_session=False
+        )
+        session.commit()
+        if atualizados:
+            get_pedidos.clear()
+            get_resumo_pedidos.clear()
             return True
         return False
     except Exception as e:
@@ -527,6 +687,7 @@ def add_usuario(username, password, nivel):
         )
         session.add(usuario)
         session.commit()
+        get_usuarios.clear()
         return True
     except Exception as e:
         session.rollback()
@@ -535,17 +696,20 @@ def add_usuario(username, password, nivel):
     finally:
         session.close()
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_usuarios():
     if not SQLALCHEMY_AVAILABLE:
         return []
         
     session = Session()
     try:
-        usuarios = session.query(Usuario).order_by(Usuario.username).all()
-        return [(u.id, u.username, u.nivel, u.criado_em) for u in usuarios]
-    except Exception as e:
-        st.error(f"Erro ao buscar usuários: {e}")
-        return []
+        usuarios = session.query(
+            Usuario.id, Usuario.username, Usuario.nivel, Usuario.criado_em
+        ).order_by(Usuario.username).all()
+        return [tuple(u) for u in usuarios]
+    except Exception:
+        logger.exception("Erro ao buscar usuários")
+        raise
     finally:
         session.close()
 
@@ -561,26 +725,23 @@ def alertas_estoque():
         
     session = Session()
     try:
-        alertas_data = session.query(EstoqueEscola, Produto, Escola).join(
+        alertas_data = session.query(
+            EstoqueEscola.escola_id,
+            Escola.nome,
+            Produto.nome,
+            Produto.tamanho,
+            EstoqueEscola.quantidade,
+            Produto.estoque_minimo
+        ).join(
             Produto, EstoqueEscola.produto_id == Produto.id
         ).join(
             Escola, EstoqueEscola.escola_id == Escola.id
         ).filter(EstoqueEscola.quantidade <= Produto.estoque_minimo).all()
         
-        resultado = []
-        for alerta_item in alertas_data:
-            resultado.append((
-                alerta_item.EstoqueEscola.escola_id, 
-                alerta_item.Escola.nome, 
-                alerta_item.Produto.nome, 
-                alerta_item.Produto.tamanho,
-                alerta_item.EstoqueEscola.quantidade, 
-                alerta_item.Produto.estoque_minimo
-            ))
-        return resultado
-    except Exception as e:
-        st.error(f"Erro ao buscar alertas: {e}")
-        return []
+        return [tuple(alerta_item) for alerta_item in alertas_data]
+    except Exception:
+        logger.exception("Erro ao buscar alertas")
+        raise
     finally:
         session.close()
 
@@ -599,12 +760,16 @@ def main():
         - psycopg2-binary==2.9.9
         - pytz==2023.3
         - python-dotenv==1.0.0
+        - numpy==1.26.4
+        - pandas==2.3.3
         
         **Python: 3.11.9 (recomendado)**
         """)
         return
         
-    init_db()
+    # Se a inicialização falhar, tenta de novo no próximo rerun
+    if not init_db():
+        init_db.clear()
     
     if 'user' not in st.session_state:
         st.session_state.user = None
@@ -643,6 +808,18 @@ def show_main_app():
     
     choice = st.sidebar.selectbox("Navegação", menu_options)
     
+    # Falha de leitura no banco: mostra o erro e mantém o menu e o logout
+    try:
+        mostrar_pagina(choice)
+    except SQLAlchemyError as e:
+        st.error(f"Erro ao consultar o banco de dados: {e}")
+    
+    st.sidebar.markdown("---")
+    if st.sidebar.button("🚪 Sair"):
+        st.session_state.user = None
+        st.rerun()
+
+def mostrar_pagina(choice):
     if choice == "📊 Dashboard":
         show_dashboard()
     elif choice == "👥 Gestão de Clientes":
@@ -659,31 +836,25 @@ def show_main_app():
         show_ai_system()
     elif choice == "🔐 Administração":
         show_admin_panel()
-    
-    st.sidebar.markdown("---")
-    if st.sidebar.button("🚪 Sair"):
-        st.session_state.user = None
-        st.rerun()
 
 def show_dashboard():
     st.title("📊 Dashboard Principal")
     
     col1, col2, col3, col4 = st.columns(4)
+    total_clientes, total_escolas = get_contagens()
     
     with col1:
-        clientes = get_clientes()
-        st.metric("Total de Clientes", len(clientes))
+        st.metric("Total de Clientes", total_clientes)
     
     with col2:
-        escolas = get_escolas()
-        st.metric("Escolas Parceiras", len(escolas))
+        st.metric("Escolas Parceiras", total_escolas)
     
     with col3:
-        pedidos = get_pedidos()
-        st.metric("Pedidos Realizados", len(pedidos))
+        resumo_pedidos = get_resumo_pedidos()
+        st.metric("Pedidos Realizados", sum(quantidade for _, quantidade, _ in resumo_pedidos))
     
     with col4:
-        total_vendas = sum(pedido[4] for pedido in pedidos)
+        total_vendas = sum(total for _, _, total in resumo_pedidos)
         st.metric("Faturamento Total", f"R$ {total_vendas:,.2f}")
 
 def show_client_management():
@@ -713,12 +884,13 @@ def show_client_management():
         st.subheader("Lista de Clientes")
         clientes = get_clientes()
         
-        for cliente in clientes:
-            with st.expander(f"{cliente[1]} - {cliente[4] or 'Sem CPF'}"):
-                st.write(f"**Telefone:** {cliente[2]}")
-                st.write(f"**Email:** {cliente[3]}")
-                st.write(f"**Endereço:** {cliente[5]}")
-                st.write(f"**Cadastrado em:** {format_date_br(cliente[6])}")
+        if clientes:
+            df_clientes = pd.DataFrame(clientes, columns=['ID', 'Nome', 'Telefone', 'Email', 'CPF',
+                                                          'Endereço', 'Cadastrado em'])
+            df_clientes['Cadastrado em'] = pd.to_datetime(df_clientes['Cadastrado em']).dt.strftime(FORMATO_DATA_BR)
+            st.dataframe(df_clientes.drop(columns='ID'), use_container_width=True, hide_index=True)
+        else:
+            st.info("Nenhum cliente cadastrado.")
 
 def show_school_management():
     st.title("🏫 Gestão de Escolas")
@@ -747,13 +919,13 @@ def show_school_management():
         st.subheader("Escolas Parceiras")
         escolas = get_escolas()
         
-        for escola in escolas:
-            with st.expander(f"{escola[1]}"):
-                st.write(f"**Telefone:** {escola[2]}")
-                st.write(f"**Email:** {escola[3]}")
-                st.write(f"**Endereço:** {escola[4]}")
-                st.write(f"**Responsável:** {escola[5]}")
-                st.write(f"**Cadastrado em:** {format_date_br(escola[6])}")
+        if escolas:
+            df_escolas = pd.DataFrame(escolas, columns=['ID', 'Nome', 'Telefone', 'Email', 'Endereço',
+                                                        'Responsável', 'Cadastrado em'])
+            df_escolas['Cadastrado em'] = pd.to_datetime(df_escolas['Cadastrado em']).dt.strftime(FORMATO_DATA_BR)
+            st.dataframe(df_escolas.drop(columns='ID'), use_container_width=True, hide_index=True)
+        else:
+            st.info("Nenhuma escola cadastrada.")
     
     with tab3:
         st.subheader("Estoque por Escola")
@@ -768,12 +940,12 @@ def show_school_management():
             st.warning("Nenhum produto cadastrado. Cadastre produtos primeiro.")
             return
         
-        escola_selecionada = st.selectbox("Selecione a Escola", 
-                                         [f"{e[0]} - {e[1]}" for e in escolas])
+        escola_nomes = {e[0]: e[1] for e in escolas}
+        escola_id = st.selectbox("Selecione a Escola", list(escola_nomes),
+                                 format_func=lambda id_escola: f"{id_escola} - {escola_nomes[id_escola]}")
         
-        if escola_selecionada:
-            escola_id = int(escola_selecionada.split(' - ')[0])
-            escola_nome = escola_selecionada.split(' - ')[1]
+        if escola_id:
+            escola_nome = escola_nomes[escola_id]
             
             st.write(f"### Estoque da Escola: {escola_nome}")
             
@@ -782,32 +954,28 @@ def show_school_management():
             if not estoque:
                 st.info("Nenhum produto vinculado a esta escola ainda.")
             else:
-                for item in estoque:
-                    col1, col2, col3 = st.columns([3, 1, 1])
-                    with col1:
-                        st.write(f"**{item[1]}** - Tamanho: {item[2]}")
-                    with col2:
-                        st.write(f"**Estoque:** {item[3]}")
-                    with col3:
-                        if item[3] <= item[4]:
-                            st.error(f"⚠️ Mín: {item[4]}")
-                        else:
-                            st.success(f"✅ Mín: {item[4]}")
+                df_estoque = pd.DataFrame(estoque, columns=['ID', 'Produto', 'Tamanho', 'Estoque', 'Mínimo',
+                                                            'Preço', 'Custo', 'Produto_ID']).astype({
+                    'Tamanho': 'category', 'Estoque': 'int32', 'Mínimo': 'int32',
+                    'Preço': 'float32', 'Custo': 'float32'
+                })
+                df_estoque['Status'] = np.select(
+                    [df_estoque['Estoque'] <= 0, df_estoque['Estoque'] <= df_estoque['Mínimo']],
+                    ['❌ Esgotado', '⚠️ Baixo'],
+                    default='✅ Suficiente'
+                )
+                st.dataframe(df_estoque[['Produto', 'Tamanho', 'Estoque', 'Mínimo', 'Status']],
+                             use_container_width=True, hide_index=True)
             
             st.markdown("---")
             st.subheader("Ajustar Estoque")
             
-            produto_ajuste = st.selectbox("Selecione o Produto", 
-                                         [f"{p[0]} - {p[1]} ({p[6]})" for p in produtos])
+            produto_rotulos = {p[0]: f"{p[0]} - {p[1]} ({p[6]})" for p in produtos}
+            produto_id = st.selectbox("Selecione o Produto", list(produto_rotulos),
+                                      format_func=produto_rotulos.get)
             
-            if produto_ajuste:
-                produto_id = int(produto_ajuste.split(' - ')[0])
-                
-                estoque_atual = 0
-                for item in estoque:
-                    if item[7] == produto_id:
-                        estoque_atual = item[3]
-                        break
+            if produto_id:
+                estoque_atual = next((item[3] for item in estoque if item[7] == produto_id), 0)
                 
                 nova_quantidade = st.number_input("Nova quantidade", 
                                                  min_value=0, 
@@ -826,6 +994,7 @@ def show_product_management():
     
     with tab1:
         st.subheader("Novo Produto")
+        escolas = get_escolas()
         with st.form("novo_produto"):
             nome = st.text_input("Nome do Produto *")
             descricao = st.text_area("Descrição")
@@ -838,10 +1007,8 @@ def show_product_management():
             with col3:
                 estoque_minimo = st.number_input("Estoque Mínimo", min_value=0, value=5)
             with col4:
-                tamanhos = ["", "PP", "P", "M", "G", "GG", "EXG", "2", "4", "6", "8", "10", "12", "Único"]
-                tamanho = st.selectbox("Tamanho *", tamanhos)
+                tamanho = st.selectbox("Tamanho *", TAMANHOS)
             
-            escolas = get_escolas()
             if escolas:
                 vincular_escolas = st.checkbox("Vincular este produto a todas as escolas automaticamente", value=True)
                 estoque_inicial = st.number_input("Estoque inicial nas escolas", min_value=0, value=0)
@@ -874,18 +1041,25 @@ def show_product_management():
         st.subheader("Lista de Produtos")
         produtos = get_produtos()
         
-        for produto in produtos:
-            with st.expander(f"{produto[1]} - Tamanho: {produto[6]} - R$ {produto[3]:.2f}"):
-                st.write(f"**Descrição:** {produto[2]}")
-                st.write(f"**Preço:** R$ {produto[3]:.2f}")
-                st.write(f"**Custo:** R$ {produto[4]:.2f}")
-                st.write(f"**Estoque Mínimo:** {produto[5]}")
-                
-                if produto[3] > 0 and produto[4] > 0:
-                    margem = ((produto[3] - produto[4]) / produto[3]) * 100
-                    lucro_unitario = produto[3] - produto[4]
-                    st.write(f"**Margem:** {margem:.1f}%")
-                    st.write(f"**Lucro Unitário:** R$ {lucro_unitario:.2f}")
+        if produtos:
+            df_produtos = pd.DataFrame(produtos, columns=['ID', 'Nome', 'Descrição', 'Preço', 'Custo',
+                                                          'Estoque Mínimo', 'Tamanho', 'Criado em'])
+            com_margem = (df_produtos['Preço'] > 0) & (df_produtos['Custo'] > 0)
+            df_produtos['Lucro Unitário'] = (df_produtos['Preço'] - df_produtos['Custo']).where(com_margem)
+            df_produtos['Margem (%)'] = (df_produtos['Lucro Unitário'] / df_produtos['Preço'] * 100).round(1)
+            st.dataframe(
+                df_produtos[['Nome', 'Tamanho', 'Preço', 'Custo', 'Margem (%)', 'Lucro Unitário',
+                             'Estoque Mínimo', 'Descrição']],
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'Preço': st.column_config.NumberColumn(format="R$ %.2f"),
+                    'Custo': st.column_config.NumberColumn(format="R$ %.2f"),
+                    'Lucro Unitário': st.column_config.NumberColumn(format="R$ %.2f"),
+                }
+            )
+        else:
+            st.info("Nenhum produto cadastrado.")
 
 def show_order_management():
     st.title("📦 Sistema de Pedidos")
@@ -911,56 +1085,54 @@ def show_order_management():
             st.warning("Cadastre produtos primeiro para criar pedidos")
             return
         
+        escola_rotulos = {e[0]: f"{e[0]} - {e[1]}" for e in escolas}
+        escola_id = st.selectbox("Escola *", list(escola_rotulos),
+                                 format_func=escola_rotulos.get)
+        estoque_escola = get_estoque_escola(escola_id)
+        
         with st.form("novo_pedido"):
             col1, col2 = st.columns(2)
             
             with col1:
-                cliente_selecionado = st.selectbox("Cliente *", 
-                                                  [f"{c[0]} - {c[1]}" for c in clientes])
-                escola_selecionada = st.selectbox("Escola *", 
-                                                 [f"{e[0]} - {e[1]}" for e in escolas])
+                cliente_rotulos = {c[0]: f"{c[0]} - {c[1]}" for c in clientes}
+                cliente_id = st.selectbox("Cliente *", list(cliente_rotulos),
+                                          format_func=cliente_rotulos.get)
                 desconto = st.number_input("Desconto (%)", min_value=0.0, max_value=100.0, value=0.0)
             
             st.subheader("Itens do Pedido")
             
             itens = []
-            if escola_selecionada:
-                escola_id = int(escola_selecionada.split(' - ')[0])
-                estoque_escola = get_estoque_escola(escola_id)
+            
+            produtos_por_id = {p[0]: p for p in produtos}
+            estoque_por_produto = {item[7]: item[3] for item in estoque_escola}
+            
+            produtos_com_estoque = [p for p in produtos if estoque_por_produto.get(p[0], 0) > 0]
+            
+            produto_rotulos = {p[0]: f"{p[0]} - {p[1]} ({p[6]}) - Estoque: {estoque_por_produto[p[0]]}"
+                               for p in produtos_com_estoque}
             
             for i in range(3):
                 col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
                 with col1:
-                    produtos_com_estoque = []
-                    for produto in produtos:
-                        estoque_disponivel = 0
-                        for item in estoque_escola:
-                            if item[7] == produto[0]:
-                                estoque_disponivel = item[3]
-                                break
-                        
-                        if estoque_disponivel > 0:
-                            produtos_com_estoque.append(produto)
-                    
                     if produtos_com_estoque:
-                        produto_opcoes = [f"{p[0]} - {p[1]} ({p[6]}) - Estoque: {next((item[3] for item in estoque_escola if item[7] == p[0]), 0)}" 
-                                         for p in produtos_com_estoque]
-                        produto_selecionado = st.selectbox(f"Produto {i+1}", [""] + produto_opcoes, key=f"prod_{i}")
+                        produto_selecionado = st.selectbox(f"Produto {i+1}", [None] + list(produto_rotulos),
+                                                           format_func=lambda id_produto: produto_rotulos.get(id_produto, ""),
+                                                           key=f"prod_{i}")
                     else:
                         st.warning("Nenhum produto com estoque")
                         produto_selecionado = None
                 
                 with col2:
                     if produto_selecionado:
-                        produto_id = int(produto_selecionado.split(' - ')[0])
-                        estoque_disponivel = next((item[3] for item in estoque_escola if item[7] == produto_id), 0)
+                        produto_id = produto_selecionado
+                        estoque_disponivel = estoque_por_produto.get(produto_id, 0)
                         quantidade = st.number_input(f"Qtd {i+1}", min_value=1, max_value=estoque_disponivel, value=1, key=f"qtd_{i}")
                     else:
                         quantidade = 0
                 
                 with col3:
                     if produto_selecionado:
-                        produto_info = next(p for p in produtos if p[0] == produto_id)
+                        produto_info = produtos_por_id[produto_id]
                         preco = st.number_input(f"Preço {i+1}", min_value=0.0, value=float(produto_info[3]), key=f"preco_{i}")
                         custo = produto_info[4]
                     else:
@@ -983,11 +1155,7 @@ def show_order_management():
             
             if itens:
                 st.subheader("Resumo do Pedido")
-                total_venda = sum(item['quantidade'] * item['preco'] for item in itens)
-                total_custo = sum(item['quantidade'] * item['custo'] for item in itens)
-                total_com_desconto = total_venda - (total_venda * desconto / 100)
-                lucro_total = total_com_desconto - total_custo
-                margem_lucro = (lucro_total / total_com_desconto * 100) if total_com_desconto > 0 else 0
+                total_venda, total_com_desconto, _, lucro_total, margem_lucro = calcular_totais(itens, desconto)
                 
                 col1, col2, col3, col4 = st.columns(4)
                 with col1:
@@ -1003,16 +1171,30 @@ def show_order_management():
                 if not itens:
                     st.error("Adicione pelo menos um item ao pedido")
                 else:
-                    cliente_id = int(cliente_selecionado.split(' - ')[0])
-                    escola_id = int(escola_selecionada.split(' - ')[0])
-                    
                     pedido_id = add_pedido(cliente_id, escola_id, itens, desconto)
                     if pedido_id:
                         st.success(f"Pedido #{pedido_id} criado com sucesso!")
     
     with tab2:
         st.subheader("Histórico de Pedidos")
-        pedidos = get_pedidos()
+        
+        # Paginação do histórico
+        contagem_por_status = {status: quantidade for status, quantidade, _ in get_resumo_pedidos()}
+        col1, col2 = st.columns(2)
+        with col1:
+            filtro_status = st.selectbox("Filtrar por status", ["Todos"] + sorted(contagem_por_status))
+        status = None if filtro_status == "Todos" else filtro_status
+        total_pedidos = contagem_por_status.get(status, 0) if status else sum(contagem_por_status.values())
+        total_paginas = max(1, -(-total_pedidos // PEDIDOS_POR_PAGINA))
+        with col2:
+            pagina = st.number_input("Página", min_value=1, max_value=total_paginas, value=1)
+        
+        pedidos = get_pedidos(limite=PEDIDOS_POR_PAGINA,
+                              offset=(pagina - 1) * PEDIDOS_POR_PAGINA, status=status)
+        if not pedidos:
+            st.info("Nenhum pedido encontrado")
+        else:
+            st.caption(f"{total_pedidos} pedido(s) - página {pagina} de {total_paginas}")
         
         for pedido in pedidos:
             with st.expander(f"Pedido #{pedido[0]} - {pedido[10]} - R$ {pedido[4]:.2f} - {pedido[3]}"):
@@ -1032,21 +1214,24 @@ def show_order_management():
                 st.write("**Alterar Status:**")
                 col1, col2, col3, col4 = st.columns(4)
                 with col1:
-                    if st.button("✅ Confirmar", key=f"confirm_{pedido[0]}"):
-                        update_pedido_status(pedido[0], "Confirmado")
-                        st.rerun()
+                    st.button("✅ Confirmar", key=f"confirm_{pedido[0]}",
+                              on_click=update_pedido_status, args=(pedido[0], "Confirmado"))
                 with col2:
-                    if st.button("🚚 Enviar", key=f"enviar_{pedido[0]}"):
-                        update_pedido_status(pedido[0], "Enviado")
-                        st.rerun()
+                    st.button("🚚 Enviar", key=f"enviar_{pedido[0]}",
+                              on_click=update_pedido_status, args=(pedido[0], "Enviado"))
                 with col3:
-                    if st.button("📦 Entregue", key=f"entregue_{pedido[0]}"):
-                        update_pedido_status(pedido[0], "Entregue")
-                        st.rerun()
+                    st.button("📦 Entregue", key=f"entregue_{pedido[0]}",
+                              on_click=update_pedido_status, args=(pedido[0], "Entregue"))
                 with col4:
-                    if st.button("❌ Cancelar", key=f"cancelar_{pedido[0]}"):
-                        update_pedido_status(pedido[0], "Cancelado")
-                        st.rerun()
+                    st.button("❌ Cancelar", key=f"cancelar_{pedido[0]}",
+                              on_click=update_pedido_status, args=(pedido[0], "Cancelado"))
+
+def gerar_csv(cabecalho, linhas):
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(cabecalho)
+    writer.writerows(linhas)
+    return output.getvalue()
 
 def show_reports():
     st.title("📈 Relatórios e Análises")
@@ -1060,33 +1245,18 @@ def show_reports():
         
         with col1:
             if st.button("Exportar Clientes CSV"):
-                clientes = get_clientes()
-                output = StringIO()
-                writer = csv.writer(output)
-                writer.writerow(['ID', 'Nome', 'Telefone', 'Email', 'CPF', 'Endereço', 'Data_Criacao'])
-                for cliente in clientes:
-                    writer.writerow(cliente)
-                st.download_button("Baixar CSV", output.getvalue(), "clientes.csv", "text/csv")
+                csv_clientes = gerar_csv(['ID', 'Nome', 'Telefone', 'Email', 'CPF', 'Endereço', 'Data_Criacao'], get_clientes())
+                st.download_button("Baixar CSV", csv_clientes, "clientes.csv", "text/csv")
         
         with col2:
             if st.button("Exportar Pedidos CSV"):
-                pedidos = get_pedidos()
-                output = StringIO()
-                writer = csv.writer(output)
-                writer.writerow(['ID', 'Cliente_ID', 'Escola_ID', 'Status', 'Total', 'Desconto', 'Custo_Total', 'Lucro_Total', 'Margem_Lucro', 'Data', 'Cliente_Nome', 'Escola_Nome'])
-                for pedido in pedidos:
-                    writer.writerow(pedido)
-                st.download_button("Baixar CSV", output.getvalue(), "pedidos.csv", "text/csv")
+                csv_pedidos = gerar_csv(['ID', 'Cliente_ID', 'Escola_ID', 'Status', 'Total', 'Desconto', 'Custo_Total', 'Lucro_Total', 'Margem_Lucro', 'Data', 'Cliente_Nome', 'Escola_Nome'], get_pedidos())
+                st.download_button("Baixar CSV", csv_pedidos, "pedidos.csv", "text/csv")
         
         with col3:
             if st.button("Exportar Produtos CSV"):
-                produtos = get_produtos()
-                output = StringIO()
-                writer = csv.writer(output)
-                writer.writerow(['ID', 'Nome', 'Descricao', 'Preco', 'Custo', 'Estoque_Minimo', 'Tamanho', 'Data_Criacao'])
-                for produto in produtos:
-                    writer.writerow(produto)
-                st.download_button("Baixar CSV", output.getvalue(), "produtos.csv", "text/csv")
+                csv_produtos = gerar_csv(['ID', 'Nome', 'Descricao', 'Preco', 'Custo', 'Estoque_Minimo', 'Tamanho', 'Data_Criacao'], get_produtos())
+                st.download_button("Baixar CSV", csv_produtos, "produtos.csv", "text/csv")
 
 def show_ai_system():
     st.title("🤖 Sistema A.I. Inteligente")
@@ -1107,14 +1277,10 @@ def show_ai_system():
         alertas = alertas_estoque()
         
         if alertas:
-            for alerta in alertas:
-                st.error(f"""
-                ⚠️ **ALERTA DE ESTOQUE BAIXO**
-                - Escola: {alerta[1]}
-                - Produto: {alerta[2]} - Tamanho: {alerta[3]}
-                - Estoque atual: {alerta[4]}
-                - Mínimo recomendado: {alerta[5]}
-                """)
+            st.error(f"⚠️ **ALERTA DE ESTOQUE BAIXO** - {len(alertas)} produto(s) no mínimo ou abaixo dele")
+            df_alertas = pd.DataFrame(alertas, columns=['Escola_ID', 'Escola', 'Produto', 'Tamanho',
+                                                        'Estoque atual', 'Mínimo recomendado'])
+            st.dataframe(df_alertas.drop(columns='Escola_ID'), use_container_width=True, hide_index=True)
         else:
             st.success("✅ Nenhum alerta de estoque baixo no momento")
 
@@ -1139,7 +1305,7 @@ def show_admin_panel():
             with col2:
                 password = st.text_input("Senha", type="password")
             with col3:
-                nivel = st.selectbox("Nível", ["admin", "gestor", "vendedor"])
+                nivel = st.selectbox("Nível", NIVEIS_USUARIO)
             
             if st.form_submit_button("Criar Usuário"):
                 if username and password:
@@ -1153,11 +1319,9 @@ def show_admin_panel():
         st.subheader("Usuários do Sistema")
         usuarios = get_usuarios()
         
-        for usuario in usuarios:
-            with st.expander(f"{usuario[1]} - {usuario[2]}"):
-                st.write(f"ID: {usuario[0]}")
-                st.write(f"Nível: {usuario[2]}")
-                st.write(f"Criado em: {format_date_br(usuario[3])}")
+        df_usuarios = pd.DataFrame(usuarios, columns=['ID', 'Usuário', 'Nível', 'Criado em'])
+        df_usuarios['Criado em'] = pd.to_datetime(df_usuarios['Criado em']).dt.strftime(FORMATO_DATA_BR)
+        st.dataframe(df_usuarios, use_container_width=True, hide_index=True)
 
 if __name__ == "__main__":
     main()